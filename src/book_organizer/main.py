@@ -6,19 +6,48 @@
 """
 
 import argparse
+import os
 import re
+import shutil
 import sys
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Tuple, Dict
+from typing import List, Optional, Tuple, Dict
 from collections import defaultdict
+from operator import itemgetter
+
+# 自然順序ソート用の数字分割
+_SPLIT_DIGITS_RE = re.compile(r"(\d+)")
+# CBZ作成時の読み書きバッファサイズ（1 MiB）
+_COPY_BUFSIZE = 1 << 20
+
+
+# posix_fadvise のアドバイス値（非対応環境では None）
+if hasattr(os, "posix_fadvise"):
+    _FADV_SEQUENTIAL: Optional[int] = os.POSIX_FADV_SEQUENTIAL
+    _FADV_DONTNEED: Optional[int] = os.POSIX_FADV_DONTNEED
+else:
+    _FADV_SEQUENTIAL = None
+    _FADV_DONTNEED = None
+
+
+def _fadvise(fd: int, advice: Optional[int]):
+    """ファイルの読み込みパターンをカーネルに伝える（非対応環境では何もしない）"""
+    if advice is None:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, advice)
+    except OSError:
+        # あくまでヒントなので、失敗しても処理は続行する
+        pass
 
 
 class BookOrganizer:
     """本ファイル整理クラス"""
 
     SUPPORTED_EXTENSIONS = {".jpg", ".jpeg", ".png"}
-    NUMBERED_FILE_PATTERN = r"_\d+(?:_\d+)?$"
+    CBZ_MAX_WORKERS = 8
 
     def __init__(
         self,
@@ -28,64 +57,124 @@ class BookOrganizer:
         create_cbz: bool = False,
         magazine_mode: bool = False,
     ):
-        self.target_dir = Path(target_dir).resolve()
+        self.target_dir = Path(os.path.abspath(target_dir))
         self.dry_run = dry_run
         self.auto = auto
         self.create_cbz = create_cbz
         self.magazine_mode = magazine_mode
         self.title = self.target_dir.name
+        # analyze_files の結果のキャッシュ
+        self._file_groups = None
 
     def analyze_files(self) -> Dict[str, Dict]:
         """ファイルを分析して複数のファイル群に分類する
 
         Returns:
             Dict[str, Dict]: {タイトル: {'title_only': PathまたはNone, 'numbered': [Path]}}
+
+        結果はキャッシュされ、2回目以降はディレクトリを再走査しない。
+        ファイル構成が変わった場合は invalidate() でキャッシュを破棄する。
         """
-        if not self.target_dir.exists():
-            raise FileNotFoundError(f"ディレクトリが見つかりません: {self.target_dir}")
+        if self._file_groups is not None:
+            return self._file_groups
 
-        # 画像ファイルを取得
-        all_files = []
-        for ext in self.SUPPORTED_EXTENSIONS:
-            all_files.extend(self.target_dir.glob(f"*{ext}"))
+        # 画像ファイルを取得（存在確認は scandir の例外で兼ねる）
+        try:
+            all_entries = self._scan_image_entries(self.target_dir)
+        except (FileNotFoundError, NotADirectoryError) as e:
+            raise FileNotFoundError(
+                f"ディレクトリが見つかりません: {self.target_dir}"
+            ) from e
 
-        if not all_files:
+        if not all_entries:
             raise ValueError("画像ファイルが見つかりません")
 
-        # ファイル群を分類
-        file_groups = defaultdict(lambda: {"title_only": None, "numbered": []})
+        # ファイル群を分類（タイトルのみファイルと連番ファイルを別々に保持）
+        title_only = {}
+        numbered = defaultdict(list)
 
-        for file_path in all_files:
-            stem = file_path.stem
+        for entry in all_entries:
+            # Path.stem を使わずファイル名文字列から拡張子を除去
+            stem, ext = os.path.splitext(entry.name)
+            file_path = Path(entry.path)
 
             # 連番ファイルかチェック（_数字で終わるか、_数字_数字で終わる）
-            if re.search(self.NUMBERED_FILE_PATTERN, stem):
-                # タイトル部分を抽出
-                title = re.sub(self.NUMBERED_FILE_PATTERN, "", stem)
-                file_groups[title]["numbered"].append(file_path)
+            parsed = self._split_numbered(stem)
+            if parsed:
+                # 判定時に取り出した番号からそのままソートキーを作る
+                # 番号が同じ場合は拡張子で比較する（ゼロ埋めの桁数は順序に影響しない）
+                title, page, variant = parsed
+                sort_key = (page, variant, ext.lower())
+                numbered[title].append((sort_key, file_path))
             else:
                 # タイトルのみファイル
-                file_groups[stem]["title_only"] = file_path
+                title_only[stem] = file_path
 
         # 各グループの連番ファイルをソート
-        for title in file_groups:
-            file_groups[title]["numbered"].sort(
-                key=lambda x: self._natural_sort_key(x.name)
-            )
-
-        # 空のグループを除去
-        return {
-            title: files
-            for title, files in file_groups.items()
-            if files["title_only"] or files["numbered"]
+        for title, keyed_files in numbered.items():
+            keyed_files.sort(key=itemgetter(0))
+            numbered[title] = [file_path for _, file_path in keyed_files]
+
+        # タイトルごとにまとめる（どのタイトルも少なくとも1ファイルを持つ）
+        self._file_groups = {
+            title: {"title_only": title_only.get(title), "numbered": numbered[title]}
+            for title in dict.fromkeys([*numbered, *title_only])
         }
+        return self._file_groups
+
+    def invalidate(self):
+        """analyze_files の結果のキャッシュを破棄する"""
+        self._file_groups = None
+
+    @staticmethod
+    def _split_numbered(stem: str) -> Optional[Tuple[str, int, int]]:
+        """連番ファイル名（拡張子なし）をタイトルと番号に分解する
 
-    def _natural_sort_key(self, filename: str):
-        """自然順序ソート用のキー生成"""
-        return [
-            int(text) if text.isdigit() else text.lower()
-            for text in re.split(r"(\d+)", filename)
-        ]
+        _数字 または _数字_数字 で終わる名前を連番ファイルとみなす。
+        判定は正規表現を使わず rsplit と isdecimal で行う。
+
+        Returns:
+            Optional[Tuple[str, int, int]]: (タイトル, 番号, バリエーション番号)。
+                バリエーション番号がない場合（_000）は -1 で、_000_1 より前に並ぶ。
+                連番ファイルでない場合は None
+        """
+        parts = stem.rsplit("_", 2)
+        if len(parts) < 2 or not parts[-1].isdecimal():
+            return None
+        if len(parts) == 3 and parts[-2].isdecimal():
+            return parts[0], int(parts[-2]), int(parts[-1])
+        return "_".join(parts[:-1]), int(parts[-1]), -1
+
+    @classmethod
+    def _scan_image_entries(cls, directory: Path) -> List[os.DirEntry]:
+        """ディレクトリ直下の画像ファイルのエントリを1回の走査で取得
+
+        拡張子は大文字小文字を区別しない（.JPG なども対象）
+        """
+        extensions = tuple(ext.lower() for ext in cls.SUPPORTED_EXTENSIONS)
+        with os.scandir(directory) as entries:
+            return [
+                entry
+                for entry in entries
+                if entry.name.lower().endswith(extensions) and entry.is_file()
+            ]
+
+    @classmethod
+    def _scan_image_files(cls, directory: Path) -> List[Path]:
+        """ディレクトリ直下の画像ファイルを1回の走査で取得"""
+        return [Path(entry.path) for entry in cls._scan_image_entries(directory)]
+
+    @staticmethod
+    def _natural_sort_key(filename: str):
+        """自然順序ソート用のキー生成
+
+        キャプチャ付きの split では数字部分が必ず奇数番目に来るため、
+        要素ごとに isdigit() で判定せずスライス単位でまとめて変換する
+        """
+        parts = _SPLIT_DIGITS_RE.split(filename)
+        parts[::2] = map(str.lower, parts[::2])
+        parts[1::2] = map(int, parts[1::2])
+        return parts
 
     def generate_rename_plan(self) -> List[Tuple[Path, Path, str]]:
         """リネーム計画を生成する
@@ -111,8 +200,12 @@ class BookOrganizer:
             if not self.magazine_mode and len(numbered_files) < 2:
                 raise ValueError(f"タイトル '{title}': 連番ファイルが2つ以上必要です")
 
-            # タイトル用ディレクトリのパス
-            title_dir = self.target_dir / title
+            # 新しいファイルパスの共通部分（タイトル用ディレクトリ/タイトル_）
+            # ループ内で Path の結合を繰り返さないよう文字列で保持する
+            new_prefix = os.path.join(self.target_dir, title, f"{title}_")
+
+            # このグループで使うゼロ埋め済みの番号表（最大の番号は連番ファイル数+1）
+            page_nums = [f"{i:03d}" for i in range(len(numbered_files) + 2)]
 
             if self.magazine_mode:
                 # 雑誌モード: 表紙なしで単純に連番
@@ -120,14 +213,16 @@ class BookOrganizer:
 
                 # タイトルファイルを001に
                 if title_only_file:
-                    title_new_name = title_dir / f"{title}_001{title_only_file.suffix}"
+                    title_new_name = Path(
+                        f"{new_prefix}{page_nums[1]}{title_only_file.suffix}"
+                    )
                     rename_plan.append((title_only_file, title_new_name, title))
                     current_num = 2
 
                 # 連番ファイルを順番に
                 for numbered_file in numbered_files:
-                    new_name = (
-                        title_dir / f"{title}_{current_num:03d}{numbered_file.suffix}"
+                    new_name = Path(
+                        f"{new_prefix}{page_nums[current_num]}{numbered_file.suffix}"
                     )
                     rename_plan.append((numbered_file, new_name, title))
                     current_num += 1
@@ -135,12 +230,14 @@ class BookOrganizer:
                 # 従来モード: 表紙あり
                 # 表紙ファイル（最後から-1の連番ファイル）を001に
                 cover_file = numbered_files[-2]  # 最後から-1のファイルが表紙
-                cover_new_name = title_dir / f"{title}_001{cover_file.suffix}"
+                cover_new_name = Path(f"{new_prefix}{page_nums[1]}{cover_file.suffix}")
                 rename_plan.append((cover_file, cover_new_name, title))
 
                 # タイトルのみファイルを002に（表紙の次のページ）
                 if title_only_file:
-                    title_new_name = title_dir / f"{title}_002{title_only_file.suffix}"
+                    title_new_name = Path(
+                        f"{new_prefix}{page_nums[2]}{title_only_file.suffix}"
+                    )
                     rename_plan.append((title_only_file, title_new_name, title))
 
                 # 既存の連番ファイルを調整
@@ -148,24 +245,20 @@ class BookOrganizer:
                     3 if title_only_file else 2
                 )  # タイトルファイルがある場合は003から、ない場合は002から
 
+                # 表紙の位置と最後のファイルの番号はループ外で一度だけ計算
+                cover_idx = len(numbered_files) - 2
+                last_num = cover_idx + start_num
+
                 for i, current_file in enumerate(numbered_files):
-                    if current_file == cover_file:  # 表紙になるファイルはスキップ
+                    if i == cover_idx:  # 表紙になるファイルはスキップ
                         continue
 
-                    if i < len(numbered_files) - 2:  # 表紙より前のファイル
-                        new_num = i + start_num
-                        new_name = (
-                            title_dir / f"{title}_{new_num:03d}{current_file.suffix}"
-                        )
-                        rename_plan.append((current_file, new_name, title))
-                    else:  # 最後のファイル（元の027など）
-                        # 表紙より前のファイル数を計算して適切な番号を付ける
-                        files_before_cover = len(numbered_files) - 2
-                        new_num = files_before_cover + start_num
-                        new_name = (
-                            title_dir / f"{title}_{new_num:03d}{current_file.suffix}"
-                        )
-                        rename_plan.append((current_file, new_name, title))
+                    # 表紙より前のファイルは順に、最後のファイル（元の027など）は末尾へ
+                    new_num = i + start_num if i < cover_idx else last_num
+                    new_name = Path(
+                        f"{new_prefix}{page_nums[new_num]}{current_file.suffix}"
+                    )
+                    rename_plan.append((current_file, new_name, title))
 
         return rename_plan
 
@@ -219,12 +312,15 @@ class BookOrganizer:
             print("🔍 ドライランモード - 実際のファイル変更は行いません")
             return True
 
-        # 作成するディレクトリの一覧を作成
-        directories_to_create = set()
-        for _, new_file, _ in rename_plan:
-            directories_to_create.add(new_file.parent)
+        # ファイル構成が変わるため分析結果のキャッシュを破棄
+        self.invalidate()
+
+        # 作成するディレクトリの一覧を作成（タイトルごとに1つ、計画順を保持）
+        titles = dict.fromkeys(title for _, _, title in rename_plan)
+        directories_to_create = [self.target_dir / title for title in titles]
 
         temp_files = []
+        moved_files = []
         created_dirs = []
 
         try:
@@ -235,15 +331,41 @@ class BookOrganizer:
                     created_dirs.append(dir_path)
                     print(f"📁 ディレクトリ作成: {dir_path.name}")
 
-            # Step 2: 全ファイルを一時名に変更
-            for i, (old_file, new_file, _) in enumerate(rename_plan):
-                temp_name = old_file.parent / f"TEMP_RENAME_{i:03d}{old_file.suffix}"
-                old_file.rename(temp_name)
-                temp_files.append((temp_name, new_file))
+            # 移動先が移動元とも既存ファイルとも重ならなければ直接移動する
+            # （今回作成したディレクトリは空なので既存ファイルの確認は不要）
+            # 既存ファイルがある場合は従来の Path.rename による2段階移動に任せる。
+            # その場合の扱いはOS依存で、Windows ではエラーとなり元に戻すが、
+            # Mac/Linux では従来どおり既存ファイルが上書きされる
+            created_titles = {dir_path.name for dir_path in created_dirs}
+            source_files = {old_file for old_file, _, _ in rename_plan}
+            can_move_directly = source_files.isdisjoint(
+                new_file for _, new_file, _ in rename_plan
+            ) and not any(
+                title not in created_titles and new_file.exists()
+                for _, new_file, title in rename_plan
+            )
+
+            if can_move_directly:
+                # Step 2: 一時名を経由せず最終位置に直接移動
+                for old_file, new_file, _ in rename_plan:
+                    os.replace(old_file, new_file)
+                    moved_files.append((old_file, new_file))
+            else:
+                # Step 2: 全ファイルを一時名に変更
+                for i, (old_file, new_file, _) in enumerate(rename_plan):
+                    temp_name = (
+                        old_file.parent / f"TEMP_RENAME_{i:03d}{old_file.suffix}"
+                    )
+                    old_file.rename(temp_name)
+                    temp_files.append((temp_name, new_file))
+
+                # Step 3: 一時ファイルを最終位置に移動
+                for temp_file, new_file in temp_files:
+                    temp_file.rename(new_file)
 
-            # Step 3: 一時ファイルを最終位置に移動
-            for temp_file, new_file in temp_files:
-                temp_file.rename(new_file)
+            # 移動は完了したため、以降のエラーではファイルを元に戻さない
+            moved_files.clear()
+            temp_files.clear()
 
             print("✅ ファイル整理が完了しました")
 
@@ -254,8 +376,11 @@ class BookOrganizer:
             return True
 
         except Exception as e:
-            # エラー時は一時ファイルを元に戻す
+            # エラー時は移動済みファイル・一時ファイルを元に戻す
             print(f"❌ エラーが発生しました: {e}")
+            for original_file, new_file in reversed(moved_files):
+                if new_file.exists():
+                    os.replace(new_file, original_file)
             for i, (temp_file, _) in enumerate(temp_files):
                 if temp_file.exists():
                     original_file = rename_plan[i][0]
@@ -298,64 +423,86 @@ class BookOrganizer:
         return self.execute_rename(rename_plan)
 
     def create_cbz_files(self, directories: List[Path]):
-        """作成されたディレクトリをCBZファイルに変換"""
-        for directory in directories:
-            if not directory.exists() or not directory.is_dir():
-                continue
+        """作成されたディレクトリをCBZファイルに変換
+
+        ディレクトリごとのCBZ作成は互いに独立しているため並列に実行する。
+        結果の表示はメインスレッドでディレクトリ順に行う
+        """
+        if not directories:
+            return
 
+        max_workers = min(self.CBZ_MAX_WORKERS, len(directories))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for message in executor.map(self._build_one_cbz, directories):
+                if message:
+                    print(message)
+
+    def _build_one_cbz(self, directory: Path) -> Optional[str]:
+        """1つのディレクトリをCBZファイルに変換し、表示するメッセージを返す
+
+        ワーカースレッドから呼ばれるため、ここでは出力せず例外も外に出さない
+        """
+        if not directory.exists() or not directory.is_dir():
+            return None
+
+        try:
             # 画像ファイルを取得してソート
-            image_files = []
-            for ext in self.SUPPORTED_EXTENSIONS:
-                image_files.extend(directory.glob(f"*{ext}"))
+            image_files = self._scan_image_files(directory)
 
             if not image_files:
-                print(f"⚠️  {directory.name}: 画像ファイルが見つかりません")
-                continue
+                return f"⚠️  {directory.name}: 画像ファイルが見つかりません"
 
             image_files.sort(key=lambda x: self._natural_sort_key(x.name))
 
             # CBZファイル作成
             cbz_path = directory.with_suffix(".cbz")
             if self.dry_run:
-                print(f"🔍 [Dry Run] CBZ作成予定: {cbz_path.name}")
-                continue
+                return f"🔍 [Dry Run] CBZ作成予定: {cbz_path.name}"
 
-            try:
-                with zipfile.ZipFile(cbz_path, "w", zipfile.ZIP_DEFLATED) as cbz:
-                    for image_file in image_files:
-                        cbz.write(image_file, image_file.name)
+            self._write_cbz(cbz_path, image_files)
 
-                print(f"📦 CBZ作成: {cbz_path.name} ({len(image_files)}枚)")
-            except Exception as e:
-                print(f"❌ CBZ作成エラー: {directory.name} - {e}")
+            return f"📦 CBZ作成: {cbz_path.name} ({len(image_files)}枚)"
+        except Exception as e:
+            return f"❌ CBZ作成エラー: {directory.name} - {e}"
+
+    @staticmethod
+    def _write_cbz(cbz_path: Path, image_files: List[Path]):
+        """画像ファイルをCBZファイルに書き込む
+
+        JPEG/PNGは圧縮済みのため再圧縮せず無圧縮で格納し、
+        読み込みは大きめのバッファでまとめて行う。
+        各画像は1回だけ読み込まれ、CRC-32 もその読み込み中に計算される。
+        """
+        with zipfile.ZipFile(cbz_path, "w", zipfile.ZIP_STORED) as cbz:
+            for image_file in image_files:
+                # file_size が設定済みのため ZIP64 の要否は自動で判定される
+                zinfo = zipfile.ZipInfo.from_file(image_file, image_file.name)
+                zinfo.compress_type = zipfile.ZIP_STORED
+                with open(image_file, "rb", buffering=_COPY_BUFSIZE) as src:
+                    # 先読みを広げ、読み終えた画像はページキャッシュから外す
+                    _fadvise(src.fileno(), _FADV_SEQUENTIAL)
+                    with cbz.open(zinfo, "w") as dst:
+                        shutil.copyfileobj(src, dst, _COPY_BUFSIZE)
+                    _fadvise(src.fileno(), _FADV_DONTNEED)
 
     @staticmethod
     def convert_directory_to_cbz(directory_path: str, dry_run: bool = False) -> bool:
         """既存のディレクトリをCBZファイルに変換"""
-        directory = Path(directory_path).resolve()
+        directory = Path(os.path.abspath(directory_path))
 
         if not directory.exists() or not directory.is_dir():
             print(f"❌ ディレクトリが見つかりません: {directory}")
             return False
 
         # 画像ファイルを取得
-        image_files = []
-        supported_extensions = {".jpg", ".jpeg", ".png"}
-
-        for ext in supported_extensions:
-            image_files.extend(directory.glob(f"*{ext}"))
+        image_files = BookOrganizer._scan_image_files(directory)
 
         if not image_files:
             print(f"❌ 画像ファイルが見つかりません: {directory}")
             return False
 
         # 自然順序でソート
-        image_files.sort(
-            key=lambda x: [
-                int(text) if text.isdigit() else text.lower()
-                for text in re.split(r"(\d+)", x.name)
-            ]
-        )
+        image_files.sort(key=lambda x: BookOrganizer._natural_sort_key(x.name))
 
         cbz_path = directory.with_suffix(".cbz")
 
@@ -366,9 +513,7 @@ class BookOrganizer:
             return True
 
         try:
-            with zipfile.ZipFile(cbz_path, "w", zipfile.ZIP_DEFLATED) as cbz:
-                for image_file in image_files:
-                    cbz.write(image_file, image_file.name)
+            BookOrganizer._write_cbz(cbz_path, image_files)
 
             print(f"✅ CBZ作成完了: {cbz_path.name} ({len(image_files)}枚)")
             return True
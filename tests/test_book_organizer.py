@@ -3,8 +3,10 @@
 BookOrganizerのテスト
 """
 
+import os
 import pytest
 import tempfile
+import zipfile
 import shutil
 from pathlib import Path
 from unittest.mock import patch
@@ -41,6 +43,14 @@ class TestBookOrganizer:
         assert organizer.create_cbz is False
         assert organizer.title == self.temp_path.name
 
+    def test_init_relative_path(self, monkeypatch):
+        """相対パス指定時の初期化のテスト"""
+        monkeypatch.chdir(self.temp_dir)
+        organizer = BookOrganizer(".")
+        assert organizer.target_dir.is_absolute()
+        assert organizer.target_dir.resolve() == self.temp_path.resolve()
+        assert organizer.title == self.temp_path.resolve().name
+
     def test_init_with_options(self):
         """オプション付き初期化のテスト"""
         organizer = BookOrganizer(
@@ -55,7 +65,7 @@ class TestBookOrganizer:
         non_existent_dir = self.temp_path / "non_existent"
         organizer = BookOrganizer(str(non_existent_dir))
 
-        with pytest.raises(FileNotFoundError):
+        with pytest.raises(FileNotFoundError, match="ディレクトリが見つかりません"):
             organizer.analyze_files()
 
     def test_analyze_files_no_images(self):
@@ -125,6 +135,41 @@ class TestBookOrganizer:
         assert result["manga"]["title_only"] is None
         assert len(result["manga"]["numbered"]) == 3
 
+    def test_analyze_files_uppercase_extension(self):
+        """大文字拡張子のファイルも分析対象になることのテスト"""
+        files = [
+            "manga.JPG",
+            "manga_001.Jpg",
+            "manga_002.PNG",
+            "notes.TXT",
+        ]
+        self.create_test_files(files)
+
+        organizer = BookOrganizer(self.temp_dir)
+        result = organizer.analyze_files()
+
+        assert list(result) == ["manga"]
+        assert result["manga"]["title_only"].name == "manga.JPG"
+        assert [f.name for f in result["manga"]["numbered"]] == [
+            "manga_001.Jpg",
+            "manga_002.PNG",
+        ]
+
+    def test_analyze_files_custom_extensions(self):
+        """SUPPORTED_EXTENSIONS を上書きした場合に反映されることのテスト"""
+        self.create_test_files(["manga_001.webp", "manga_002.WEBP", "manga_003.jpg"])
+
+        class WebpOrganizer(BookOrganizer):
+            SUPPORTED_EXTENSIONS = frozenset({".webp"})
+
+        organizer = WebpOrganizer(self.temp_dir)
+        result = organizer.analyze_files()
+
+        assert [f.name for f in result["manga"]["numbered"]] == [
+            "manga_001.webp",
+            "manga_002.WEBP",
+        ]
+
     def test_natural_sort_key(self):
         """自然順序ソートのテスト"""
         organizer = BookOrganizer(self.temp_dir)
@@ -136,6 +181,86 @@ class TestBookOrganizer:
 
         assert key1 < key2 < key10
 
+        # 数字以外の部分は大文字小文字を区別しない
+        assert organizer._natural_sort_key("Cover.JPG") == ["cover.jpg"]
+        assert organizer._natural_sort_key("Vol2_Page10.png") == [
+            "vol",
+            2,
+            "_page",
+            10,
+            ".png",
+        ]
+        assert organizer._natural_sort_key("b9.png") < organizer._natural_sort_key(
+            "B10.png"
+        )
+
+    def test_analyze_files_numbered_sort_order(self):
+        """連番ファイルが番号順（バリエーション含む）に並ぶことのテスト"""
+        files = [
+            "manga_010.jpg",
+            "manga_000_2.jpg",
+            "manga_002.png",
+            "manga_000.jpg",
+            "manga_000_10.jpg",
+            "manga_000_1.jpg",
+            "manga_001.png",
+            "manga_1.jpg",
+        ]
+        self.create_test_files(files)
+
+        organizer = BookOrganizer(self.temp_dir)
+        result = organizer.analyze_files()
+
+        # 同じ番号のファイルはゼロ埋めの桁数ではなく拡張子の順に並ぶ
+        assert [f.name for f in result["manga"]["numbered"]] == [
+            "manga_000.jpg",
+            "manga_000_1.jpg",
+            "manga_000_2.jpg",
+            "manga_000_10.jpg",
+            "manga_1.jpg",
+            "manga_001.png",
+            "manga_002.png",
+            "manga_010.jpg",
+        ]
+
+    def test_analyze_files_cached(self):
+        """分析結果がキャッシュされ、invalidate で再走査されることのテスト"""
+        self.create_test_files(["manga_001.jpg", "manga_002.jpg"])
+
+        organizer = BookOrganizer(self.temp_dir)
+
+        with patch.object(
+            BookOrganizer,
+            "_scan_image_entries",
+            wraps=BookOrganizer._scan_image_entries,
+        ) as mock_scan:
+            first = organizer.analyze_files()
+            organizer.generate_rename_plan()
+            assert organizer.analyze_files() is first
+            assert mock_scan.call_count == 1
+
+            # ファイル追加後も invalidate するまではキャッシュを返す
+            self.create_test_files(["manga_003.jpg"])
+            assert len(organizer.analyze_files()["manga"]["numbered"]) == 2
+
+            organizer.invalidate()
+            assert len(organizer.analyze_files()["manga"]["numbered"]) == 3
+            assert mock_scan.call_count == 2
+
+    def test_split_numbered(self):
+        """連番ファイル名の分解のテスト"""
+        organizer = BookOrganizer(self.temp_dir)
+
+        assert organizer._split_numbered("manga_001") == ("manga", 1, -1)
+        assert organizer._split_numbered("manga_000_2") == ("manga", 0, 2)
+        assert organizer._split_numbered("my_manga_010") == ("my_manga", 10, -1)
+        assert organizer._split_numbered("vol_1_2_3") == ("vol_1", 2, 3)
+        assert organizer._split_numbered("manga__001") == ("manga_", 1, -1)
+        assert organizer._split_numbered("manga") is None
+        assert organizer._split_numbered("manga_") is None
+        assert organizer._split_numbered("manga_v1") is None
+        assert organizer._split_numbered("001") is None
+
     def test_generate_rename_plan_insufficient_files(self):
         """ファイル数不足のテスト"""
         files = [
@@ -257,6 +382,135 @@ class TestBookOrganizer:
             assert (self.temp_path / "manga_001.jpg").exists()
             assert (self.temp_path / "manga_002.jpg").exists()
 
+    def test_execute_rename_multiple_titles(self):
+        """複数タイトルのリネーム実行のテスト"""
+        files = [
+            "manga1_001.jpg",
+            "manga1_002.jpg",
+            "manga2_001.png",
+            "manga2_002.png",
+            "manga2_003.png",
+        ]
+        self.create_test_files(files)
+
+        organizer = BookOrganizer(self.temp_dir, auto=True)
+        plan = organizer.generate_rename_plan()
+
+        with patch("builtins.print"):
+            result = organizer.execute_rename(plan)
+
+        assert result is True
+
+        # タイトルごとにディレクトリが作成され、ファイルが移動されていることを確認
+        manga1_dir = self.temp_path / "manga1"
+        manga2_dir = self.temp_path / "manga2"
+        assert sorted(f.name for f in manga1_dir.iterdir()) == [
+            "manga1_001.jpg",
+            "manga1_002.jpg",
+        ]
+        assert sorted(f.name for f in manga2_dir.iterdir()) == [
+            "manga2_001.png",
+            "manga2_002.png",
+            "manga2_003.png",
+        ]
+        assert not any(f.is_file() for f in self.temp_path.iterdir())
+
+    def test_execute_rename_rollback_on_error(self):
+        """移動途中でエラーが発生した場合に元に戻すことのテスト"""
+        files = [
+            "manga_001.jpg",
+            "manga_002.jpg",
+            "manga_003.jpg",
+        ]
+        self.create_test_files(files)
+
+        organizer = BookOrganizer(self.temp_dir, auto=True)
+        plan = organizer.generate_rename_plan()
+
+        real_replace = os.replace
+        calls = []
+
+        def failing_replace(src, dst):
+            # 2回目の移動で失敗させる（ロールバック時の呼び出しは通す）
+            calls.append((src, dst))
+            if len(calls) == 2:
+                raise OSError("disk error")
+            real_replace(src, dst)
+
+        with patch(
+            "book_organizer.main.os.replace", side_effect=failing_replace
+        ), patch("builtins.print"):
+            result = organizer.execute_rename(plan)
+
+        assert result is False
+
+        # 元のファイルが戻り、作成したディレクトリが削除されていることを確認
+        assert sorted(f.name for f in self.temp_path.iterdir()) == files
+
+    def test_execute_rename_existing_destination(self):
+        """移動先に既存ファイルがある場合は2段階移動（Path.rename）になることのテスト
+
+        os.replace による直接移動は全OSで黙って上書きするため使わない。
+        Path.rename は Windows では FileExistsError となって元に戻り、
+        Mac/Linux では従来どおり上書きする。
+        """
+        files = [
+            "manga_001.jpg",
+            "manga_002.jpg",
+        ]
+        self.create_test_files(files)
+        existing_dir = self.temp_path / "manga"
+        existing_dir.mkdir()
+        (existing_dir / "manga_001.jpg").write_bytes(b"existing")
+
+        organizer = BookOrganizer(self.temp_dir, auto=True)
+        plan = organizer.generate_rename_plan()
+
+        with patch(
+            "book_organizer.main.os.replace", wraps=os.replace
+        ) as mock_replace, patch("builtins.print"):
+            result = organizer.execute_rename(plan)
+
+        assert mock_replace.call_count == 0
+
+        if os.name == "nt":
+            # Windows: 既存ファイルは保持され、移動元のファイルは元に戻る
+            assert result is False
+            assert (existing_dir / "manga_001.jpg").read_bytes() == b"existing"
+            assert (self.temp_path / "manga_001.jpg").exists()
+            assert (self.temp_path / "manga_002.jpg").exists()
+        else:
+            # Mac/Linux: 既存ファイルは表紙（manga_001.jpg）で上書きされる
+            assert result is True
+            assert sorted(f.name for f in existing_dir.iterdir()) == files
+            assert (existing_dir / "manga_001.jpg").read_bytes() == b""
+            assert not any(f.is_file() for f in self.temp_path.iterdir())
+
+    def test_execute_rename_no_rollback_on_cbz_error(self):
+        """移動完了後のCBZ作成エラーではファイルを元に戻さないことのテスト"""
+        files = [
+            "manga_001.jpg",
+            "manga_002.jpg",
+        ]
+        self.create_test_files(files)
+
+        organizer = BookOrganizer(self.temp_dir, auto=True, create_cbz=True)
+        plan = organizer.generate_rename_plan()
+
+        scan_error = PermissionError("permission denied")
+        with patch.object(
+            BookOrganizer, "_scan_image_entries", side_effect=scan_error
+        ), patch("builtins.print") as mock_print:
+            result = organizer.execute_rename(plan)
+
+        # CBZ作成エラーはディレクトリ単位で報告され、整理自体は成功扱い
+        assert result is True
+        mock_print.assert_any_call("❌ CBZ作成エラー: manga - permission denied")
+
+        # 整理済みのファイルはディレクトリ内に残っていることを確認
+        assert sorted(f.name for f in (self.temp_path / "manga").iterdir()) == files
+        assert not any(f.is_file() for f in self.temp_path.iterdir())
+
     def test_magazine_mode_init(self):
         """雑誌モード初期化のテスト"""
         organizer = BookOrganizer(self.temp_dir, magazine_mode=True)
@@ -326,3 +580,102 @@ class TestBookOrganizer:
         plan_4 = next((p for p in plan if p[0].name == "manga_020.jpg"), None)
         assert plan_4 is not None
         assert "manga_004.jpg" in str(plan_4[1])
+
+    def test_convert_directory_to_cbz(self):
+        """ディレクトリのCBZ変換のテスト"""
+        book_dir = self.temp_path / "manga"
+        book_dir.mkdir()
+        for name in ["manga_010.jpg", "manga_002.jpg", "manga_001.png"]:
+            (book_dir / name).write_bytes(name.encode() * 100)
+        (book_dir / "notes.txt").touch()
+
+        with patch("builtins.print"):
+            result = BookOrganizer.convert_directory_to_cbz(str(book_dir))
+
+        assert result is True
+
+        cbz_path = self.temp_path / "manga.cbz"
+        with zipfile.ZipFile(cbz_path) as cbz:
+            infos = cbz.infolist()
+            # 自然順序で格納されていることを確認
+            assert [info.filename for info in infos] == [
+                "manga_001.png",
+                "manga_002.jpg",
+                "manga_010.jpg",
+            ]
+            # 画像は再圧縮せずに格納されていることを確認
+            assert all(info.compress_type == zipfile.ZIP_STORED for info in infos)
+            # ストリーミング書き込みでも CRC-32 が正しく記録されていることを確認
+            assert cbz.testzip() is None
+            assert cbz.read("manga_002.jpg") == b"manga_002.jpg" * 100
+
+    def test_execute_rename_with_cbz(self):
+        """整理後に複数ディレクトリのCBZを作成するテスト"""
+        files = [
+            "manga1_001.jpg",
+            "manga1_002.jpg",
+            "manga2_001.png",
+            "manga2_002.png",
+            "manga2_003.png",
+        ]
+        self.create_test_files(files)
+
+        organizer = BookOrganizer(self.temp_dir, auto=True, create_cbz=True)
+        plan = organizer.generate_rename_plan()
+
+        with patch("builtins.print") as mock_print:
+            result = organizer.execute_rename(plan)
+
+        assert result is True
+
+        # CBZ作成結果がディレクトリ順に表示されていることを確認
+        cbz_messages = [
+            c.args[0]
+            for c in mock_print.call_args_list
+            if c.args and str(c.args[0]).startswith("📦")
+        ]
+        assert cbz_messages == [
+            "📦 CBZ作成: manga1.cbz (2枚)",
+            "📦 CBZ作成: manga2.cbz (3枚)",
+        ]
+
+        # タイトルごとにCBZファイルが作成されていることを確認
+        with zipfile.ZipFile(self.temp_path / "manga1.cbz") as cbz:
+            assert cbz.namelist() == ["manga1_001.jpg", "manga1_002.jpg"]
+        with zipfile.ZipFile(self.temp_path / "manga2.cbz") as cbz:
+            assert cbz.namelist() == [
+                "manga2_001.png",
+                "manga2_002.png",
+                "manga2_003.png",
+            ]
+
+    @pytest.mark.skipif(
+        not hasattr(os, "posix_fadvise"), reason="posix_fadvise 非対応環境"
+    )
+    def test_convert_directory_to_cbz_fadvise_failure(self):
+        """posix_fadvise が失敗してもCBZ変換が続行されることのテスト"""
+        book_dir = self.temp_path / "manga"
+        book_dir.mkdir()
+        (book_dir / "manga_001.jpg").write_bytes(b"page1")
+        (book_dir / "manga_002.jpg").write_bytes(b"page2")
+
+        fadvise_error = OSError("not supported")
+        with patch(
+            "book_organizer.main.os.posix_fadvise", side_effect=fadvise_error
+        ) as mock_fadvise, patch("builtins.print"):
+            result = BookOrganizer.convert_directory_to_cbz(str(book_dir))
+
+        assert result is True
+
+        # 各画像に SEQUENTIAL と DONTNEED の両方が渡されていることを確認
+        advices = [c.args[3] for c in mock_fadvise.call_args_list]
+        assert (
+            advices
+            == [
+                os.POSIX_FADV_SEQUENTIAL,
+                os.POSIX_FADV_DONTNEED,
+            ]
+            * 2
+        )
+        with zipfile.ZipFile(self.temp_path / "manga.cbz") as cbz:
+            assert cbz.read("manga_002.jpg") == b"page2"